@@ -6,33 +6,82 @@ A Telegram bot interface for the cybersecurity chatbot
 
 import logging
 import os
+import re
 import json
 import asyncio
-from typing import Dict, Optional
+import functools
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
-
-# Import the main CyberRakshak AI class
-from main import CyberRakshakAI
+from telegram.ext import (
+    AIORateLimiter, Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+)
+from telegram.request import HTTPXRequest
+
+# HTTP/2 for Bot API calls needs httpx's optional h2 dependency
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Optional shared cache
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    aioredis = None
+
+# Import the main CyberRakshak AI class and its shared local analysis
+from main import CyberRakshakAI, SAFE_BROWSING_POOL_SIZE, analyze_local
 
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+    level=logging.WARNING
 )
+# httpx and PTB log every Bot API request at INFO; keep that chatter off the hot path
+logging.getLogger('httpx').setLevel(logging.WARNING)
+logging.getLogger('telegram').setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-class CyberRakshakTelegramBot:
-    def __init__(self):
-        self.cyber_ai = CyberRakshakAI()
-        self.user_languages = {}  # Store user language preferences
-        
-    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Start command handler"""
-        user_id = update.effective_user.id
-        self.user_languages[user_id] = 'english'  # Default language
-        
-        welcome_text = """🛡️ Welcome to CyberRakshak AI!
+# How long shared verdicts stay in Redis, in seconds
+ANALYSIS_CACHE_TTL = 3600
+URL_CACHE_TTL = 300
+
+# Upper bounds on concurrent outbound calls to each remote API (thread pool sizes)
+GEMINI_MAX_CONCURRENCY = 16
+SAFE_BROWSING_MAX_CONCURRENCY = SAFE_BROWSING_POOL_SIZE  # one pooled connection per call
+
+# Worker processes for local analysis; os.cpu_count() ignores container CPU limits,
+# so never fork more than this many copies of the bot
+LOCAL_ANALYSIS_MAX_WORKERS = 4
+
+# A message that is nothing but a link gets a URL check; anything else, including scam
+# texts that contain links, gets a full analysis. Without a scheme the text must start
+# with www., carry a path, or end in a common TLD, so "Rs.5000", "Mr.Sharma" or a
+# forwarded "WhatsApp_Update.apk" are analyzed as messages.
+_COMMON_TLDS = (
+    'com', 'net', 'org', 'in', 'co', 'io', 'ly', 'me', 'info', 'biz', 'gov', 'edu',
+    'app', 'dev', 'ai', 'us', 'uk', 'cc', 'tv', 'ru', 'cn', 'xyz', 'top', 'site',
+    'online', 'live', 'link', 'club', 'shop', 'store', 'icu', 'vip', 'win', 'buzz',
+    'tk', 'ml', 'ga', 'cf', 'gq', 'pw'
+)
+_HOST = r'(?:[\w-]+\.)+'
+_URL_ONLY_RE = re.compile(
+    r'https?://\S+'
+    rf'|www\.{_HOST}[a-z]{{2,}}(?:[/?#:]\S*)?'
+    rf'|{_HOST}[a-z]{{2,}}[/?#]\S*'
+    rf'|{_HOST}(?:{"|".join(_COMMON_TLDS)})(?:[/?#:]\S*)?',
+    re.IGNORECASE
+)
+
+# Static menus, keyboards and help texts, built once at import time
+_WELCOME_EN = """🛡️ Welcome to CyberRakshak AI!
 
 I'm your personal cybersecurity guardian. I can help you:
 
@@ -43,55 +92,8 @@ I'm your personal cybersecurity guardian. I can help you:
 🌐 Switch between English and Hindi
 
 Choose what you'd like to do:"""
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Analyze Message", callback_data='analyze')],
-            [InlineKeyboardButton("🚨 Emergency Help", callback_data='emergency')],
-            [InlineKeyboardButton("🔗 Check URL Safety", callback_data='url_check')],
-            [InlineKeyboardButton("📚 Learn About Scams", callback_data='learn')],
-            [InlineKeyboardButton("🌐 Switch to Hindi", callback_data='hindi')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(welcome_text, reply_markup=reply_markup)
 
-    async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Handle button callbacks"""
-        query = update.callback_query
-        await query.answer()
-        
-        user_id = update.effective_user.id
-        current_lang = self.user_languages.get(user_id, 'english')
-        
-        if query.data == 'analyze':
-            await query.edit_message_text(
-                "📝 Send me the suspicious message you received (SMS, email, WhatsApp, etc.) and I'll analyze it for potential threats."
-            )
-            context.user_data['waiting_for'] = 'message_analysis'
-            
-        elif query.data == 'emergency':
-            await self.send_emergency_response(query, current_lang)
-            
-        elif query.data == 'url_check':
-            await query.edit_message_text(
-                "🔗 Send me the URL/link you want me to check for safety."
-            )
-            context.user_data['waiting_for'] = 'url_check'
-            
-        elif query.data == 'learn':
-            await self.send_scam_education(query, current_lang)
-            
-        elif query.data == 'hindi':
-            self.user_languages[user_id] = 'hindi'
-            await self.send_main_menu_hindi(query)
-            
-        elif query.data == 'english':
-            self.user_languages[user_id] = 'english'
-            await self.send_main_menu_english(query)
-
-    async def send_main_menu_hindi(self, query):
-        """Send main menu in Hindi"""
-        welcome_text = """🛡️ साइबर रक्षक AI में आपका स्वागत है!
+_WELCOME_HI = """🛡️ साइबर रक्षक AI में आपका स्वागत है!
 
 मैं आपका व्यक्तिगत साइबर सुरक्षा गार्डियन हूँ। मैं आपकी मदद कर सकता हूँ:
 
@@ -102,180 +104,24 @@ Choose what you'd like to do:"""
 🌐 अंग्रेजी और हिंदी के बीच स्विच करने में
 
 आप क्या करना चाहते हैं:"""
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 संदेश विश्लेषण", callback_data='analyze')],
-            [InlineKeyboardButton("🚨 आपातकालीन सहायता", callback_data='emergency')],
-            [InlineKeyboardButton("🔗 URL सुरक्षा जांच", callback_data='url_check')],
-            [InlineKeyboardButton("📚 घोटालों के बारे में जानें", callback_data='learn')],
-            [InlineKeyboardButton("🌐 Switch to English", callback_data='english')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(welcome_text, reply_markup=reply_markup)
-
-    async def send_main_menu_english(self, query):
-        """Send main menu in English"""
-        welcome_text = """🛡️ Welcome to CyberRakshak AI!
-
-I'm your personal cybersecurity guardian. I can help you:
-
-🔍 Analyze suspicious messages for scams
-🚨 Get emergency help if you've been scammed
-🔗 Check if URLs/links are safe
-📚 Learn about common online scams
-🌐 Switch between English and Hindi
-
-Choose what you'd like to do:"""
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Analyze Message", callback_data='analyze')],
-            [InlineKeyboardButton("🚨 Emergency Help", callback_data='emergency')],
-            [InlineKeyboardButton("🔗 Check URL Safety", callback_data='url_check')],
-            [InlineKeyboardButton("📚 Learn About Scams", callback_data='learn')],
-            [InlineKeyboardButton("🌐 Switch to Hindi", callback_data='hindi')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(welcome_text, reply_markup=reply_markup)
 
-    async def message_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Handle text messages"""
-        user_id = update.effective_user.id
-        current_lang = self.user_languages.get(user_id, 'english')
-        self.cyber_ai.current_language = current_lang
-        
-        waiting_for = context.user_data.get('waiting_for')
-        
-        if waiting_for == 'message_analysis':
-            await self.analyze_message(update, context)
-        elif waiting_for == 'url_check':
-            await self.check_url(update, context)
-        else:
-            # Default behavior - analyze any message sent
-            await self.analyze_message(update, context)
+_KB_EN = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Analyze Message", callback_data='analyze')],
+    [InlineKeyboardButton("🚨 Emergency Help", callback_data='emergency')],
+    [InlineKeyboardButton("🔗 Check URL Safety", callback_data='url_check')],
+    [InlineKeyboardButton("📚 Learn About Scams", callback_data='learn')],
+    [InlineKeyboardButton("🌐 Switch to Hindi", callback_data='hindi')]
+])
 
-    async def analyze_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Analyze a message for threats"""
-        message_text = update.message.text
-        user_id = update.effective_user.id
-        current_lang = self.user_languages.get(user_id, 'english')
-        self.cyber_ai.current_language = current_lang
-        
-        # Send "analyzing" message
-        analyzing_msg = "🤖 Analyzing with AI..." if current_lang == 'english' else "🤖 AI के साथ विश्लेषण कर रहा हूँ..."
-        status_message = await update.message.reply_text(analyzing_msg)
-        
-        try:
-            # Try Gemini analysis first
-            result = None
-            if self.cyber_ai.gemini_client:
-                result = self.cyber_ai.analyze_message_with_gemini(message_text)
-            
-            # Fall back to local analysis if Gemini fails
-            if not result:
-                local_msg = "🔍 Analyzing with local patterns..." if current_lang == 'english' else "🔍 स्थानीय पैटर्न के साथ विश्लेषण..."
-                await status_message.edit_text(local_msg)
-                result = self.cyber_ai.analyze_message_local(message_text)
-            
-            # Format and send results
-            await status_message.delete()
-            await self.send_analysis_result(update, result, current_lang, message_text)
-            
-        except Exception as e:
-            logger.error(f"Analysis failed: {str(e)}")
-            error_msg = "⚠️ Analysis failed. Using basic detection." if current_lang == 'english' else "⚠️ विश्लेषण असफल। मूल जांच का उपयोग।"
-            await status_message.edit_text(error_msg)
-            
-            # Fall back to local analysis
-            result = self.cyber_ai.analyze_message_local(message_text)
-            await self.send_analysis_result(update, result, current_lang, message_text)
-        
-        # Clear waiting state
-        context.user_data.pop('waiting_for', None)
+_KB_HI = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 संदेश विश्लेषण", callback_data='analyze')],
+    [InlineKeyboardButton("🚨 आपातकालीन सहायता", callback_data='emergency')],
+    [InlineKeyboardButton("🔗 URL सुरक्षा जांच", callback_data='url_check')],
+    [InlineKeyboardButton("📚 घोटालों के बारे में जानें", callback_data='learn')],
+    [InlineKeyboardButton("🌐 Switch to English", callback_data='english')]
+])
 
-    async def send_analysis_result(self, update: Update, result: Dict, language: str, original_message: str) -> None:
-        """Send the analysis result to the user"""
-        if result['is_threat']:
-            threat_detected = "⚠️ THREAT DETECTED" if language == 'english' else "⚠️ खतरा पाया गया"
-            response = f"🔍 *Analysis Result*\n\n{threat_detected}: {result['threat_type'].upper()}\n"
-            response += f"Confidence: {result['confidence']:.1%}\n\n"
-            response += f"📝 *Explanation:*\n{result['explanation']}\n\n"
-            response += f"💡 *Advice:*\n{result['advice']}"
-            
-            # Check for emergency keywords
-            emergency_keywords = ['shared otp', 'gave otp', 'sent money', 'got scammed', 
-                                'हो गया', 'दिया', 'भेज दिया', 'धोखा']
-            if any(keyword in original_message.lower() for keyword in emergency_keywords):
-                emergency_button = InlineKeyboardButton(
-                    "🚨 EMERGENCY HELP" if language == 'english' else "🚨 आपातकालीन सहायता", 
-                    callback_data='emergency'
-                )
-                keyboard = [[emergency_button]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(response, reply_markup=reply_markup, parse_mode='Markdown')
-            else:
-                await update.message.reply_text(response, parse_mode='Markdown')
-        else:
-            safe_msg = "✅ Message appears safe" if language == 'english' else "✅ संदेश सुरक्षित लगता है"
-            response = f"🔍 *Analysis Result*\n\n{safe_msg}\n\n📝 Note: {result['explanation']}"
-            await update.message.reply_text(response, parse_mode='Markdown')
-
-    async def check_url(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Check URL safety"""
-        url = update.message.text.strip()
-        user_id = update.effective_user.id
-        current_lang = self.user_languages.get(user_id, 'english')
-        
-        checking_msg = "🔍 Checking URL safety..." if current_lang == 'english' else "🔍 URL सुरक्षा जांच रहा हूँ..."
-        status_message = await update.message.reply_text(checking_msg)
-        
-        try:
-            # Try Google Safe Browsing first
-            safe_browsing_result = self.cyber_ai.check_url_with_safe_browsing(url)
-            
-            response = f"🔗 *URL Analysis:* {url}\n\n"
-            
-            if safe_browsing_result:
-                if not safe_browsing_result["is_safe"]:
-                    response += "🚨 *DANGER: URL flagged by Google Safe Browsing!*\n"
-                    response += f"Threat: {safe_browsing_result['threat_type']}\n"
-                    response += f"Details: {safe_browsing_result['details']}\n\n"
-                    response += "💡 *Recommendations:*\n• DO NOT visit this URL\n• It contains malware or phishing content\n• Report to authorities if received via message"
-                else:
-                    response += "✅ Google Safe Browsing: No threats detected\n"
-                    response += "⚠️ Always verify unknown links before clicking"
-            else:
-                # Basic local analysis
-                suspicious_indicators = [
-                    'bit.ly', 'tinyurl.com', 'short.link', 'rb.gy',
-                    'phishing', 'malware', 'suspicious-domain'
-                ]
-                
-                is_suspicious = any(indicator in url.lower() for indicator in suspicious_indicators)
-                
-                if is_suspicious:
-                    response += "⚠️ *WARNING: URL contains suspicious patterns!*\n"
-                    response += "💡 Exercise caution with this link"
-                else:
-                    response += "✅ No obvious suspicious patterns detected\n"
-                    response += "⚠️ Always verify unknown links before clicking"
-            
-            await status_message.delete()
-            await update.message.reply_text(response, parse_mode='Markdown')
-            
-        except Exception as e:
-            logger.error(f"URL check failed: {str(e)}")
-            error_msg = "⚠️ URL check failed. Please try again." if current_lang == 'english' else "⚠️ URL जांच असफल। कृपया फिर से कोशिश करें।"
-            await status_message.edit_text(error_msg)
-        
-        # Clear waiting state
-        context.user_data.pop('waiting_for', None)
-
-    async def send_emergency_response(self, query, language: str) -> None:
-        """Send emergency response information"""
-        if language == 'english':
-            response = """🚨 *EMERGENCY MODE ACTIVATED* 🚨
+_EMERGENCY_EN = """🚨 *EMERGENCY MODE ACTIVATED* 🚨
 
 *Immediate Actions Required:*
 1. STOP all transactions immediately
@@ -293,8 +139,8 @@ Choose what you'd like to do:"""
 🌐 Cyber Crime Portal: cybercrime.gov.in
 
 ⚠️ Act quickly - time is critical in cyber fraud cases!"""
-        else:
-            response = """🚨 *आपातकालीन मोड सक्रिय* 🚨
+
+_EMERGENCY_HI = """🚨 *आपातकालीन मोड सक्रिय* 🚨
 
 *तत्काल आवश्यक कार्रवाई:*
 1. तुरंत सभी लेनदेन बंद करें
@@ -312,13 +158,8 @@ Choose what you'd like to do:"""
 🌐 साइबर क्राइम पोर्टल: cybercrime.gov.in
 
 ⚠️ जल्दी कार्रवाई करें - साइबर फ्रॉड के मामलों में समय महत्वपूर्ण है!"""
-        
-        await query.edit_message_text(response, parse_mode='Markdown')
 
-    async def send_scam_education(self, query, language: str) -> None:
-        """Send educational content about scams"""
-        if language == 'english':
-            response = """📚 *Common Online Scams - Stay Informed!*
+_EDUCATION_EN = """📚 *Common Online Scams - Stay Informed!*
 
 *Phishing:* Fake emails/messages asking for personal info. Look for urgent language, spelling errors, suspicious links.
 
@@ -333,8 +174,8 @@ Choose what you'd like to do:"""
 *Tech Support Scams:* Fake calls claiming computer issues. Never give remote access to unknown callers.
 
 🛡️ Remember: When in doubt, verify independently!"""
-        else:
-            response = """📚 *आम ऑनलाइन घोटाले - जानकार रहें!*
+
+_EDUCATION_HI = """📚 *आम ऑनलाइन घोटाले - जानकार रहें!*
 
 *फिशिंग:* व्यक्तिगत जानकारी मांगने वाले नकली ईमेल/संदेश। तत्काल भाषा, वर्तनी त्रुटियों, संदिग्ध लिंक पर ध्यान दें।
 
@@ -349,13 +190,345 @@ Choose what you'd like to do:"""
 *तकनीकी सहायता घोटाले:* कंप्यूटर समस्याओं का दावा करने वाले नकली कॉल। अज्ञात कॉल करने वालों को रिमोट एक्सेस न दें।
 
 🛡️ याद रखें: संदेह होने पर स्वतंत्र रूप से सत्यापित करें!"""
+
+# Localized strings, looked up as I18N[language][key]
+I18N = {
+    'english': {
+        'welcome': _WELCOME_EN,
+        'menu_kb': _KB_EN,
+        'analyzing': "🤖 Analyzing with AI...",
+        'analysis_failed': "⚠️ Analysis failed. Using basic detection.",
+        'threat': "⚠️ THREAT DETECTED",
+        'safe': "✅ Message appears safe",
+        'checking_url': "🔍 Checking URL safety...",
+        'url_check_failed': "⚠️ URL check failed. Please try again.",
+        'emergency': _EMERGENCY_EN,
+        'education': _EDUCATION_EN,
+        'emergency_kb': InlineKeyboardMarkup([[InlineKeyboardButton("🚨 EMERGENCY HELP", callback_data='emergency')]]),
+    },
+    'hindi': {
+        'welcome': _WELCOME_HI,
+        'menu_kb': _KB_HI,
+        'analyzing': "🤖 AI के साथ विश्लेषण कर रहा हूँ...",
+        'analysis_failed': "⚠️ विश्लेषण असफल। मूल जांच का उपयोग।",
+        'threat': "⚠️ खतरा पाया गया",
+        'safe': "✅ संदेश सुरक्षित लगता है",
+        'checking_url': "🔍 URL सुरक्षा जांच रहा हूँ...",
+        'url_check_failed': "⚠️ URL जांच असफल। कृपया फिर से कोशिश करें।",
+        'emergency': _EMERGENCY_HI,
+        'education': _EDUCATION_HI,
+        'emergency_kb': InlineKeyboardMarkup([[InlineKeyboardButton("🚨 आपातकालीन सहायता", callback_data='emergency')]]),
+    },
+}
+
+def normalize_url(url: str) -> str:
+    """Canonicalize a URL for cache keys: add a missing scheme, lowercase scheme and host,
+    drop the fragment and a trailing slash"""
+    if '://' not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+class CyberRakshakTelegramBot:
+    def __init__(self):
+        self.cyber_ai = CyberRakshakAI()
+        # English is the default, so locally only Hindi users are remembered (used if Redis is unavailable)
+        self._hindi_users = set()
+        
+        # Share verdicts across restarts and bot workers when Redis is configured
+        self.redis = None
+        redis_url = os.getenv("REDIS_URL", "")
+        if REDIS_AVAILABLE and redis_url:
+            self.redis = aioredis.from_url(redis_url, decode_responses=True)
+            print("✅ Redis result cache enabled")
+        
+        # Each remote API gets its own thread pool, sized to its concurrency cap, so a
+        # burst of slow Gemini calls never queues URL checks behind it
+        self._gemini_pool = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix='gemini')
+        self._sb_pool = ThreadPoolExecutor(max_workers=SAFE_BROWSING_MAX_CONCURRENCY, thread_name_prefix='safe-browsing')
+        self._inflight: Dict[str, asyncio.Task] = {}
+        
+        # Local keyword analysis is CPU-bound, so run it in worker processes
+        # where it is not serialized behind the event loop by the GIL
+        self._cpu_pool = self._new_cpu_pool()
+        
+    async def _run_shared(self, key: str, ttl: int, executor: ThreadPoolExecutor, func, *args, **kwargs):
+        """Run a blocking call on executor and cache its result under key for ttl seconds,
+        joining an identical call already in flight"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._call_and_cache(key, ttl, executor, func, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled waiter does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _call_and_cache(self, key: str, ttl: int, executor: ThreadPoolExecutor, func, *args, **kwargs):
+        """Run func once for every caller sharing key, writing its result to Redis once"""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+        if result:
+            await self._cache_set(key, result, ttl)
+        return result
+
+    @staticmethod
+    def _new_cpu_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=min(LOCAL_ANALYSIS_MAX_WORKERS, os.cpu_count() or 1))
+
+    async def _analyze_local(self, message: str, language: str) -> Dict:
+        """Run local keyword analysis in the process pool, in-process if the pool has broken"""
+        pool = self._cpu_pool
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, analyze_local, message, language)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool once for everyone
+            if self._cpu_pool is pool:
+                logger.warning('Local analysis pool broke, starting a new one')
+                self._cpu_pool = self._new_cpu_pool()
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await asyncio.to_thread(analyze_local, message, language)
+
+    async def get_lang(self, user_id: int) -> str:
+        """Get a user's language preference, defaulting to English"""
+        if self.redis:
+            try:
+                language = await self.redis.get(f"lang:{user_id}")
+                if language:
+                    return language
+            except Exception as e:
+                logger.warning('Redis read failed: %s', e)
+        return 'hindi' if user_id in self._hindi_users else 'english'
+
+    async def set_lang(self, user_id: int, language: str) -> None:
+        """Persist a user's language preference (in Redis when configured)"""
+        if language == 'hindi':
+            self._hindi_users.add(user_id)
+        else:
+            self._hindi_users.discard(user_id)
+        if self.redis:
+            try:
+                await self.redis.set(f"lang:{user_id}", language)
+            except Exception as e:
+                logger.warning('Redis write failed: %s', e)
+
+    async def _ctx(self, update: Update) -> Tuple[int, str]:
+        """Return the (user_id, language) pair a handler needs, looked up once"""
+        user_id = update.effective_user.id
+        return user_id, await self.get_lang(user_id)
+
+    async def _cache_get(self, key: str) -> Optional[Dict]:
+        """Return a cached verdict from Redis, or None on a miss or error"""
+        if not self.redis:
+            return None
+        try:
+            cached = await self.redis.get(key)
+        except Exception as e:
+            logger.warning('Redis read failed: %s', e)
+            return None
+        return json.loads(cached) if cached else None
+
+    async def _cache_set(self, key: str, value: Dict, ttl: int) -> None:
+        """Store a verdict in Redis for ttl seconds; errors only skip caching"""
+        if not self.redis:
+            return
+        try:
+            await self.redis.setex(key, ttl, json.dumps(value))
+        except Exception as e:
+            logger.warning('Redis write failed: %s', e)
+
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Start command handler"""
+        user_id = update.effective_user.id
+        await self.set_lang(user_id, 'english')  # Default language
+        
+        await self._send_menu(update.effective_message, 'english')
+
+    async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle button callbacks"""
+        query = update.callback_query
+        await query.answer()
+        
+        user_id, current_lang = await self._ctx(update)
+        
+        if query.data == 'analyze':
+            await query.edit_message_text(
+                "📝 Send me the suspicious message you received (SMS, email, WhatsApp, etc.) and I'll analyze it for potential threats."
+            )
+            
+        elif query.data == 'emergency':
+            await self.send_emergency_response(query, current_lang)
+            
+        elif query.data == 'url_check':
+            await query.edit_message_text(
+                "🔗 Send me the URL/link you want me to check for safety."
+            )
+            
+        elif query.data == 'learn':
+            await self.send_scam_education(query, current_lang)
+            
+        elif query.data == 'hindi':
+            await self.set_lang(user_id, 'hindi')
+            await self._send_menu(query, 'hindi')
+            
+        elif query.data == 'english':
+            await self.set_lang(user_id, 'english')
+            await self._send_menu(query, 'english')
+
+    async def _send_menu(self, target, language: str) -> None:
+        """Show the main menu, editing a callback query's message or replying to a Message"""
+        t = I18N[language]
+        if hasattr(target, 'edit_message_text'):
+            await target.edit_message_text(t['welcome'], reply_markup=t['menu_kb'])
+        else:
+            await target.reply_text(t['welcome'], reply_markup=t['menu_kb'])
+
+    async def message_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle text messages"""
+        if _URL_ONLY_RE.fullmatch(update.effective_message.text.strip()):
+            await self.check_url(update, context)
+        else:
+            await self.analyze_message(update, context)
+
+    async def analyze_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Analyze a message for threats"""
+        message = update.effective_message
+        message_text = message.text
+        _, current_lang = await self._ctx(update)
+        t = I18N[current_lang]
         
-        await query.edit_message_text(response, parse_mode='Markdown')
+        # Send "analyzing" message
+        status_message = await message.reply_text(t['analyzing'])
+        
+        try:
+            # Try Gemini analysis first; blocking calls run in worker threads
+            # so the event loop keeps serving other users. Forwarded scams
+            # repeat a lot, so reuse a recent Gemini verdict if one is cached.
+            cache_key = f"an:{current_lang}:{hashlib.sha256(message_text.encode()).hexdigest()}"
+            result = await self._cache_get(cache_key)
+            if not result and self.cyber_ai.gemini_client:
+                result = await self._run_shared(
+                    cache_key, ANALYSIS_CACHE_TTL, self._gemini_pool,
+                    self.cyber_ai.analyze_message_with_gemini, message_text, language=current_lang
+                )
+            
+            # Fall back to local analysis if Gemini fails
+            if not result:
+                result = await self._analyze_local(message_text, current_lang)
+            
+            # Replace the status message with the results (one API call instead of delete + send)
+            response, reply_markup = self.format_analysis_result(result, current_lang, message_text)
+            await status_message.edit_text(response, parse_mode='Markdown', reply_markup=reply_markup)
+            
+        except Exception as e:
+            logger.error('Analysis failed: %s', e)
+            await status_message.edit_text(t['analysis_failed'])
+            
+            # Fall back to local analysis
+            result = await self._analyze_local(message_text, current_lang)
+            response, reply_markup = self.format_analysis_result(result, current_lang, message_text)
+            await message.reply_text(response, parse_mode='Markdown', reply_markup=reply_markup)
+
+    def format_analysis_result(self, result: Dict, language: str,
+                               original_message: str) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        """Format the analysis result as Markdown text plus an optional keyboard"""
+        t = I18N[language]
+        if result['is_threat']:
+            response = (
+                f"🔍 *Analysis Result*\n\n{t['threat']}: {result['threat_type'].upper()}\n"
+                f"Confidence: {result['confidence']:.1%}\n\n"
+                f"📝 *Explanation:*\n{result['explanation']}\n\n"
+                f"💡 *Advice:*\n{result['advice']}"
+            )
+            
+            # Offer emergency help if the user says they were already scammed
+            if self.cyber_ai.is_emergency(original_message):
+                return response, t['emergency_kb']
+            return response, None
+        else:
+            response = f"🔍 *Analysis Result*\n\n{t['safe']}\n\n📝 Note: {result['explanation']}"
+            return response, None
+
+    async def check_url(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Check URL safety"""
+        message = update.effective_message
+        url = message.text.strip()
+        _, current_lang = await self._ctx(update)
+        t = I18N[current_lang]
+        
+        status_message = await message.reply_text(t['checking_url'])
+        
+        try:
+            # Try Google Safe Browsing first, reusing a recent verdict for the same URL
+            normalized_url = normalize_url(url)
+            cache_key = f"url:{normalized_url}"
+            safe_browsing_result = await self._cache_get(cache_key)
+            if not safe_browsing_result:
+                safe_browsing_result = await self._run_shared(
+                    cache_key, URL_CACHE_TTL, self._sb_pool,
+                    self.cyber_ai.check_url_with_safe_browsing, normalized_url
+                )
+            
+            if safe_browsing_result:
+                if not safe_browsing_result["is_safe"]:
+                    verdict = (
+                        "🚨 *DANGER: URL flagged by Google Safe Browsing!*\n"
+                        f"Threat: {safe_browsing_result['threat_type']}\n"
+                        f"Details: {safe_browsing_result['details']}\n\n"
+                        "💡 *Recommendations:*\n• DO NOT visit this URL\n• It contains malware or phishing content\n• Report to authorities if received via message"
+                    )
+                else:
+                    verdict = (
+                        "✅ Google Safe Browsing: No threats detected\n"
+                        "⚠️ Always verify unknown links before clicking"
+                    )
+            else:
+                # Basic local analysis, using the same indicators as the CLI
+                is_suspicious = bool(self.cyber_ai.find_suspicious_url_indicators(url))
+                
+                if is_suspicious:
+                    verdict = (
+                        "⚠️ *WARNING: URL contains suspicious patterns!*\n"
+                        "💡 Exercise caution with this link"
+                    )
+                else:
+                    verdict = (
+                        "✅ No obvious suspicious patterns detected\n"
+                        "⚠️ Always verify unknown links before clicking"
+                    )
+            
+            response = f"🔗 *URL Analysis:* {url}\n\n{verdict}"
+            await status_message.edit_text(response, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error('URL check failed: %s', e)
+            await status_message.edit_text(t['url_check_failed'])
+
+    async def send_emergency_response(self, query, language: str) -> None:
+        """Send emergency response information"""
+        await query.edit_message_text(I18N[language]['emergency'], parse_mode='Markdown')
+
+    async def send_scam_education(self, query, language: str) -> None:
+        """Send educational content about scams"""
+        await query.edit_message_text(I18N[language]['education'], parse_mode='Markdown')
 
     async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Log errors caused by Updates"""
         logger.warning('Update "%s" caused error "%s"', update, context.error)
 
+    async def shutdown(self, application: Application) -> None:
+        """Release Redis connections and worker pools once polling has stopped"""
+        if self.redis:
+            try:
+                await self.redis.aclose()
+            except Exception as e:
+                logger.warning('Redis close failed: %s', e)
+        self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+        self._gemini_pool.shutdown(wait=False, cancel_futures=True)
+        self._sb_pool.shutdown(wait=False, cancel_futures=True)
+        self.cyber_ai.close()
+
 def main():
     """Main function to run the Telegram bot"""
     # Get Telegram bot token from environment
@@ -372,13 +545,37 @@ def main():
     # Create the bot instance
     bot = CyberRakshakTelegramBot()
     
-    # Create the Application
-    application = Application.builder().token(bot_token).build()
+    # A large pool keeps concurrent replies from queueing for a connection;
+    # HTTP/2 (when h2 is installed) multiplexes them over fewer TLS connections
+    http_version = "2" if HTTP2_AVAILABLE else "1.1"
+    request = HTTPXRequest(connection_pool_size=256, pool_timeout=30, http_version=http_version)
+    
+    # Create the Application; updates from different chats are processed concurrently
+    builder = (
+        Application.builder()
+        .token(bot_token)
+        .concurrent_updates(True)
+        .request(request)
+        .get_updates_request(HTTPXRequest(http_version=http_version))
+        .post_shutdown(bot.shutdown)
+    )
+    
+    # Keep outgoing messages under Telegram's flood limits and retry on RetryAfter
+    try:
+        builder.rate_limiter(AIORateLimiter(
+            overall_max_rate=30, overall_time_period=1,
+            group_max_rate=20, group_time_period=60,
+            max_retries=3
+        ))
+    except RuntimeError:
+        logger.warning('Rate limiting disabled: install "python-telegram-bot[rate-limiter]" to enable it')
+    
+    application = builder.build()
     
-    # Add handlers
-    application.add_handler(CommandHandler("start", bot.start))
-    application.add_handler(CallbackQueryHandler(bot.button_handler))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.message_handler))
+    # Add handlers (non-blocking so a slow analysis never holds up other users)
+    application.add_handler(CommandHandler("start", bot.start, block=False))
+    application.add_handler(CallbackQueryHandler(bot.button_handler, block=False))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.message_handler, block=False))
     
     # Add error handler
     application.add_error_handler(bot.error_handler)